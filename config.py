@@ -4,6 +4,15 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     # Environment
     environment: str = "development"
+
+    # Background jobs
+    job_db_path: str = "jobs.sqlite3"
+    job_workers: int = 2
+    job_max_running_per_user: int = 1
+    job_chunk_size: int = 25
+    job_max_items: int = 10000
+    job_heartbeat_interval: float = 5.0
+    job_claim_timeout: float = 30.0
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,351 @@
+"""Replay a JSONL request mix against the API and report per-route latency.
+
+Each line of the mix file is one request:
+
+    {"method": "POST", "path": "/calculate", "body": {...}, "weight": 3, "route": "calculate"}
+
+Only ``path`` is required. ``route`` groups requests in the report and
+defaults to "METHOD path". In ``replay`` mode lines are sent in file order,
+cycling as needed; in ``weighted`` mode they are sampled by ``weight``.
+
+Usage:
+
+    python loadtest.py loadtest_mix.jsonl --concurrency 1,8,32 --requests 2000
+    python loadtest.py loadtest_mix.jsonl --url http://localhost:8000 --compare loadtest_reports/before.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+HISTOGRAM_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+def load_mix(path: str) -> List[Dict]:
+    """Read a request mix, skipping blank lines"""
+    entries = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "path" not in entry:
+                raise ValueError(f"{path}:{line_number}: request is missing 'path'")
+            entry.setdefault("method", "POST" if "body" in entry else "GET")
+            entry.setdefault("route", f"{entry['method']} {entry['path']}")
+            entries.append(entry)
+    if not entries:
+        raise ValueError(f"{path}: no requests found")
+    return entries
+
+
+def request_stream(entries: List[Dict], mode: str, seed: int) -> Iterator[Dict]:
+    if mode == "replay":
+        return itertools.cycle(entries)
+    rng = random.Random(seed)
+    weights = [entry.get("weight", 1) for entry in entries]
+    return iter(lambda: rng.choices(entries, weights)[0], None)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def histogram(latencies_ms: List[float]) -> Dict[str, int]:
+    buckets = {f"<={bound}ms": 0 for bound in HISTOGRAM_BOUNDS_MS}
+    buckets[f">{HISTOGRAM_BOUNDS_MS[-1]}ms"] = 0
+    for latency in latencies_ms:
+        for bound in HISTOGRAM_BOUNDS_MS:
+            if latency <= bound:
+                buckets[f"<={bound}ms"] += 1
+                break
+        else:
+            buckets[f">{HISTOGRAM_BOUNDS_MS[-1]}ms"] += 1
+    return buckets
+
+
+def summarize(samples: List[Dict], elapsed: float) -> Dict:
+    latencies = sorted(sample["latency_ms"] for sample in samples)
+    errors = sum(1 for sample in samples if sample["error"])
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+        "histogram": histogram(latencies),
+    }
+
+
+class LoadRunner:
+    """Sends requests from a shared stream over ``concurrency`` keep-alive connections"""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        parts = urlsplit(base_url)
+        if parts.scheme == "http":
+            self._connection_class, default_port = http.client.HTTPConnection, 80
+        elif parts.scheme == "https":
+            self._connection_class, default_port = http.client.HTTPSConnection, 443
+        else:
+            raise ValueError(f"Unsupported URL scheme {parts.scheme!r}, expected http or https")
+        self.host = parts.hostname
+        self.port = parts.port or default_port
+        self.timeout = timeout
+
+    def connect(self) -> http.client.HTTPConnection:
+        return self._connection_class(self.host, self.port, timeout=self.timeout)
+
+    def run(self, stream: Iterator[Dict], concurrency: int, total_requests: Optional[int],
+            duration: Optional[float]) -> Dict:
+        lock = threading.Lock()
+        samples: List[Dict] = []
+        issued = itertools.count()
+        deadline = time.perf_counter() + duration if duration else None
+
+        def next_entry() -> Optional[Dict]:
+            with lock:
+                if total_requests is not None and next(issued) >= total_requests:
+                    return None
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return None
+                return next(stream)
+
+        def worker():
+            conn = self.connect()
+            local = []
+            while True:
+                entry = next_entry()
+                if entry is None:
+                    break
+                local.append(self._send(conn, entry))
+                if local[-1]["error"] == "connection":
+                    conn.close()
+                    conn = self.connect()
+            conn.close()
+            with lock:
+                samples.extend(local)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        routes = {}
+        for route in sorted({sample["route"] for sample in samples}):
+            routes[route] = summarize([s for s in samples if s["route"] == route], elapsed)
+        return {
+            "concurrency": concurrency,
+            "elapsed_s": elapsed,
+            "overall": summarize(samples, elapsed),
+            "routes": routes,
+        }
+
+    def _send(self, conn: http.client.HTTPConnection, entry: Dict) -> Dict:
+        body = json.dumps(entry["body"]) if "body" in entry else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        headers.update(entry.get("headers", {}))
+        started = time.perf_counter()
+        try:
+            conn.request(entry["method"], entry["path"], body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            error = f"http_{response.status}" if response.status >= 400 else None
+        except (OSError, http.client.HTTPException):
+            error = "connection"
+        return {
+            "route": entry["route"],
+            "latency_ms": (time.perf_counter() - started) * 1000,
+            "error": error,
+        }
+
+
+class LocalServer:
+    """Runs ``main:app`` under uvicorn in a subprocess for the duration of the test"""
+
+    def __init__(self, port: int, workers: int):
+        self.port = port
+        self.workers = workers
+        self.process = None
+        self._tmpdir = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        # Bind first so a port already in use fails loudly instead of silently
+        # load testing whatever server is listening there; port 0 picks a free one
+        with socket.socket() as sock:
+            # uvicorn sets SO_REUSEADDR too, so TIME_WAIT leftovers from a previous run don't count as in use
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.bind(("127.0.0.1", self.port))
+            except OSError:
+                raise RuntimeError(f"Port {self.port} is already in use")
+            self.port = sock.getsockname()[1]
+        # Keep the job queue database out of the working tree
+        self._tmpdir = tempfile.TemporaryDirectory()
+        env = dict(os.environ, JOB_DB_PATH=os.path.join(self._tmpdir.name, "jobs.sqlite3"))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+        )
+        try:
+            self._wait_until_healthy()
+        except BaseException:
+            self._shutdown()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self._shutdown()
+
+    def _shutdown(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self._tmpdir.cleanup()
+
+    def _wait_until_healthy(self, timeout: float = 30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {self.process.returncode}")
+            conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=1)
+            try:
+                conn.request("GET", "/health")
+                healthy = conn.getresponse().status == 200
+            except (OSError, http.client.HTTPException):
+                healthy = False
+            finally:
+                conn.close()
+            # Only trust the probe if our uvicorn is still the process answering it
+            if healthy and self.process.poll() is None:
+                return
+            time.sleep(0.2)
+        raise RuntimeError("uvicorn did not become healthy in time")
+
+
+def print_report(report: Dict, baseline: Optional[Dict] = None):
+    baseline_levels = {level["concurrency"]: level for level in (baseline or {}).get("levels", [])}
+    for level in report["levels"]:
+        overall = level["overall"]
+        print(f"\nconcurrency={level['concurrency']}  {overall['throughput_rps']:.1f} req/s  "
+              f"errors={overall['error_rate']:.2%}")
+        print(f"  {'route':<55} {'count':>7} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        base_routes = baseline_levels.get(level["concurrency"], {}).get("routes", {})
+        for route, stats in level["routes"].items():
+            print(f"  {route:<55} {stats['requests']:>7} {stats['error_rate']:>6.1%} "
+                  f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['max_ms']:>8.1f}")
+            if route in base_routes:
+                base = base_routes[route]
+                print(f"  {'  vs baseline':<55} {'':>7} {'':>6} "
+                      f"{_delta(stats['p50_ms'], base['p50_ms']):>8} {_delta(stats['p95_ms'], base['p95_ms']):>8} "
+                      f"{_delta(stats['p99_ms'], base['p99_ms']):>8} {_delta(stats['max_ms'], base['max_ms']):>8}")
+
+
+def load_report(path: str) -> Dict:
+    """Read an earlier report to compare against"""
+    with open(path) as f:
+        report = json.load(f)
+    if not isinstance(report, dict) or not isinstance(report.get("levels"), list):
+        raise ValueError(f"{path}: not a load test report")
+    return report
+
+
+def _delta(current: float, previous: float) -> str:
+    if not previous:
+        return "n/a"
+    return f"{(current - previous) / previous:+.0%}"
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Replay a request mix against the API and report latency")
+    parser.add_argument("mix", help="JSONL file of requests to replay")
+    parser.add_argument("--url", help="Target an already running server instead of starting uvicorn")
+    parser.add_argument("--port", type=int, default=0,
+                        help="Port for the local uvicorn server (default: a free port)")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per concurrency level")
+    parser.add_argument("--duration", type=float, help="Seconds per concurrency level (overrides --requests)")
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed requests sent before each run")
+    parser.add_argument("--mode", choices=["replay", "weighted"], default="replay")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for weighted sampling")
+    parser.add_argument("--output", help="Report path (default: loadtest_reports/<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier report to compare latencies against")
+    args = parser.parse_args(argv)
+
+    entries = load_mix(args.mix)
+    # Read the baseline up front so a bad path fails before the run, not after it
+    baseline = None
+    if args.compare:
+        try:
+            baseline = load_report(args.compare)
+        except (OSError, ValueError) as e:
+            parser.error(f"--compare: {e}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+    total_requests = None if args.duration else args.requests
+
+    def run_levels(base_url: str) -> List[Dict]:
+        runner = LoadRunner(base_url)
+        results = []
+        for concurrency in levels:
+            stream = request_stream(entries, args.mode, args.seed)
+            if args.warmup:
+                runner.run(stream, min(concurrency, args.warmup), args.warmup, None)
+            results.append(runner.run(stream, concurrency, total_requests, args.duration))
+        return results
+
+    if args.url:
+        target = args.url
+        results = run_levels(args.url)
+    else:
+        with LocalServer(args.port, args.server_workers) as server:
+            target = server.url
+            results = run_levels(server.url)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "target": target,
+        "mix": os.path.basename(args.mix),
+        "mode": args.mode,
+        "server_workers": None if args.url else args.server_workers,
+        "levels": results,
+    }
+    output = args.output or os.path.join("loadtest_reports", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report, baseline)
+    print(f"\nReport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
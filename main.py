@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
 from routes import router
+from services.job_queue import JobQueue
 
 app = FastAPI(
     title="Mortgage Calculator API",
@@ -21,6 +22,24 @@ app.add_middleware(
 # Include routes
 app.include_router(router)
 
+
+@app.on_event("startup")
+def start_job_queue():
+    app.state.job_queue = JobQueue(
+        settings.job_db_path,
+        workers=settings.job_workers,
+        max_running_per_user=settings.job_max_running_per_user,
+        chunk_size=settings.job_chunk_size,
+        heartbeat_interval=settings.job_heartbeat_interval,
+        claim_timeout=settings.job_claim_timeout,
+    )
+    app.state.job_queue.start()
+
+
+@app.on_event("shutdown")
+def stop_job_queue():
+    app.state.job_queue.stop()
+
 @app.get("/")
 async def root():
     return {"message": "Mortgage Calculator API", "status": "running"}
@@ -1,18 +1,34 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Query, Request
 from schemas import (
+    MortgageCalculationBase,
     MortgageCalculationRequest, 
     MortgageCalculationResult, 
     ScenarioComparisonRequest,
     ScenarioComparison,
-    HealthCheck
+    HealthCheck,
+    JobSubmitRequest,
+    JobStatus,
+    JobResultsPage
 )
 from services.mortgage_calculator import MortgageCalculatorService
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
 
+def _service_inputs(model: MortgageCalculationBase) -> dict:
+    """Convert a Pydantic model to the dict the calculator service expects"""
+    inputs = model.dict()
+
+    # Convert datetime to string if needed
+    if inputs.get('purchase_date'):
+        inputs['purchase_date'] = inputs['purchase_date'].isoformat()
+    if inputs.get('one_time_payment_date'):
+        inputs['one_time_payment_date'] = inputs['one_time_payment_date'].isoformat()
+    return inputs
+
+
 @router.get("/health", response_model=HealthCheck)
 async def health_check():
     """Health check endpoint"""
@@ -30,14 +46,7 @@ async def calculate_mortgage(request: MortgageCalculationRequest):
     """Calculate mortgage payments and amortization schedule"""
     try:
         # Convert Pydantic model to dict for the service
-        inputs = request.dict()
-        
-        # Convert datetime to string if needed
-        if inputs.get('purchase_date'):
-            inputs['purchase_date'] = inputs['purchase_date'].isoformat()
-        if inputs.get('one_time_payment_date'):
-            inputs['one_time_payment_date'] = inputs['one_time_payment_date'].isoformat()
-        
+        inputs = _service_inputs(request)
         calculator = MortgageCalculatorService(inputs)
         result = calculator.calculate()
         
@@ -51,14 +60,7 @@ async def scenario_comparison(request: ScenarioComparisonRequest):
     """Compare different extra payment scenarios"""
     try:
         # Convert Pydantic model to dict for the service
-        inputs = request.inputs.dict()
-        
-        # Convert datetime to string if needed
-        if inputs.get('purchase_date'):
-            inputs['purchase_date'] = inputs['purchase_date'].isoformat()
-        if inputs.get('one_time_payment_date'):
-            inputs['one_time_payment_date'] = inputs['one_time_payment_date'].isoformat()
-        
+        inputs = _service_inputs(request.inputs)
         calculator = MortgageCalculatorService(inputs)
         scenarios = calculator.calculate_scenario_comparison(request.extra_payment_amounts)
         
@@ -78,3 +80,61 @@ async def calculate_mortgage_legacy(request: MortgageCalculationRequest):
 async def scenario_comparison_legacy(request: ScenarioComparisonRequest):
     """Legacy scenario comparison endpoint for backward compatibility"""
     return await scenario_comparison(request)
+
+
+# Background jobs for bulk work that does not fit in a request timeout.
+# These handlers are plain functions so FastAPI runs the SQLite calls in its
+# threadpool instead of on the event loop.
+def _get_job(request: Request, job_id: str, x_user_id: Optional[str]) -> dict:
+    job = request.app.state.job_queue.get(job_id)
+    # Someone else's job looks the same as a missing one
+    if job is None or (x_user_id is not None and job["owner"] != x_user_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/api/v1/jobs", response_model=JobStatus, status_code=202)
+def submit_job(job: JobSubmitRequest, request: Request, x_user_id: Optional[str] = Header(None)):
+    """Queue a bulk recalculation or scenario sweep"""
+    owner = x_user_id or (request.client.host if request.client else "anonymous")
+    return request.app.state.job_queue.submit(
+        owner=owner,
+        kind=job.kind,
+        items=[_service_inputs(item) for item in job.items],
+        priority=job.priority,
+        extra_payment_amounts=job.extra_payment_amounts,
+    )
+
+
+@router.get("/api/v1/jobs/{job_id}", response_model=JobStatus)
+def get_job(job_id: str, request: Request, x_user_id: Optional[str] = Header(None)):
+    """Get job status and progress"""
+    return _get_job(request, job_id, x_user_id)
+
+
+@router.get("/api/v1/jobs/{job_id}/results", response_model=JobResultsPage)
+def get_job_results(
+    job_id: str,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    x_user_id: Optional[str] = Header(None),
+):
+    """Get a page of finished job results"""
+    job = _get_job(request, job_id, x_user_id)
+    items = request.app.state.job_queue.results(job_id, offset=offset, limit=limit)
+    return JobResultsPage(
+        job_id=job_id,
+        status=job["status"],
+        offset=offset,
+        limit=limit,
+        total_items=job["total_items"],
+        items=items,
+    )
+
+
+@router.delete("/api/v1/jobs/{job_id}", response_model=JobStatus)
+def cancel_job(job_id: str, request: Request, x_user_id: Optional[str] = Header(None)):
+    """Cancel a queued or running job"""
+    _get_job(request, job_id, x_user_id)
+    return request.app.state.job_queue.cancel(job_id)
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, validator
-from typing import Optional, List
+from pydantic import BaseModel, Field, validator
+from typing import Optional, List, Union
 from datetime import datetime
+from config import settings
 
 
 class MortgageCalculationBase(BaseModel):
@@ -66,3 +67,48 @@ class ScenarioComparisonRequest(BaseModel):
 class HealthCheck(BaseModel):
     status: str
     timestamp: datetime
+
+
+class JobSubmitRequest(BaseModel):
+    kind: str
+    items: List[MortgageCalculationBase] = Field(..., min_length=1, max_length=settings.job_max_items)
+    priority: int = Field(0, ge=-10, le=10)
+    extra_payment_amounts: Optional[List[float]] = [50, 100, 200, 500]
+
+    @validator('kind')
+    def validate_kind(cls, v):
+        if v not in ['recalculate', 'scenario_sweep']:
+            raise ValueError('kind must be recalculate or scenario_sweep')
+        return v
+
+
+class JobStatus(BaseModel):
+    id: str
+    owner: str
+    kind: str
+    priority: int
+    status: str
+    total_items: int
+    completed_items: int
+    failed_items: int
+    progress: float
+    cancel_requested: bool
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class JobResultItem(BaseModel):
+    index: int
+    result: Optional[Union[dict, List[dict]]] = None
+    error: Optional[str] = None
+
+
+class JobResultsPage(BaseModel):
+    job_id: str
+    status: str
+    offset: int
+    limit: int
+    total_items: int
+    items: List[JobResultItem]
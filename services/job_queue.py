@@ -0,0 +1,407 @@
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from services.mortgage_calculator import MortgageCalculatorService
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ("recalculate", "scenario_sweep")
+
+# Seconds a worker thread waits before retrying after a database error,
+# e.g. "database is locked" while another process holds a write transaction
+ERROR_BACKOFF = 1.0
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    total_items INTEGER NOT NULL,
+    completed_items INTEGER NOT NULL DEFAULT 0,
+    failed_items INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    heartbeat_at REAL,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_queue ON jobs (status, priority DESC, created_at);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    item_index INTEGER NOT NULL,
+    result TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, item_index)
+);
+"""
+
+# Columns added after the first release of the jobs table
+MIGRATIONS = {
+    "worker_id": "ALTER TABLE jobs ADD COLUMN worker_id TEXT",
+    "heartbeat_at": "ALTER TABLE jobs ADD COLUMN heartbeat_at REAL",
+}
+
+JOB_COLUMNS = (
+    "id", "owner", "kind", "priority", "status", "total_items", "completed_items",
+    "failed_items", "cancel_requested", "error", "created_at", "started_at", "finished_at"
+)
+
+
+def run_chunk(kind: str, items: List[Dict], extra_payment_amounts: Optional[List[float]]) -> List[Dict]:
+    """Calculate one chunk of job items. Runs inside the process pool, so it must stay picklable."""
+    results = []
+    for inputs in items:
+        try:
+            calculator = MortgageCalculatorService(inputs)
+            if kind == "recalculate":
+                result = calculator.calculate()
+                # The schedule is hundreds of rows per item; bulk results keep the summary only
+                result.pop("amortization", None)
+            else:
+                result = calculator.calculate_scenario_comparison(extra_payment_amounts)
+            results.append({"result": result, "error": None})
+        except Exception as e:
+            results.append({"result": None, "error": str(e)})
+    return results
+
+
+class JobQueue:
+    """SQLite-backed queue of bulk calculation jobs, drained by a local worker pool.
+
+    Worker threads only claim jobs and write progress; the calculations themselves
+    run in a separate process pool so bulk work does not hold the GIL that the
+    API event loop needs for interactive requests.
+
+    Several processes may share one database (``uvicorn --workers N``, rolling
+    deploys). Each claim records the queue's ``worker_id`` and is kept alive by a
+    heartbeat; only claims whose heartbeat is older than ``claim_timeout`` are
+    taken over, and a worker that has lost its claim can no longer write to the job.
+    """
+
+    def __init__(self, db_path: str, workers: int = 2, max_running_per_user: int = 1, chunk_size: int = 25,
+                 heartbeat_interval: float = 5.0, claim_timeout: float = 30.0):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_running_per_user = max_running_per_user
+        self.chunk_size = chunk_size
+        self.heartbeat_interval = heartbeat_interval
+        self.claim_timeout = claim_timeout
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self._conn.execute(statement)
+
+    # Lifecycle
+
+    def start(self):
+        """Start the worker pool and the heartbeat that keeps this queue's claims alive"""
+        self._stopping.clear()
+        self._pool = self._new_pool()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        """Stop the workers and hand this queue's running jobs back to the queue"""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._pool:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = NULL, heartbeat_at = NULL "
+                "WHERE worker_id = ? AND status = ?",
+                (QUEUED, self.worker_id, RUNNING),
+            )
+            self._conn.close()
+
+    # Public API
+
+    def submit(self, owner: str, kind: str, items: List[Dict], priority: int = 0,
+               extra_payment_amounts: Optional[List[float]] = None) -> Dict:
+        """Queue a new job and return its status"""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"kind must be one of: {', '.join(JOB_KINDS)}")
+        if not items:
+            raise ValueError("a job needs at least one item")
+        job_id = uuid.uuid4().hex
+        payload = json.dumps({"items": items, "extra_payment_amounts": extra_payment_amounts})
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, owner, kind, priority, status, payload, total_items, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, owner, kind, priority, QUEUED, payload, len(items), _now()),
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the status of a job, or None if it does not exist"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return _job_status(row) if row else None
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict]:
+        """Return a page of finished item results, ordered by item index"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_index, result, error FROM job_results WHERE job_id = ? "
+                "ORDER BY item_index LIMIT ? OFFSET ?",
+                (job_id, limit, offset),
+            ).fetchall()
+        return [
+            {
+                "index": row["item_index"],
+                "result": json.loads(row["result"]) if row["result"] is not None else None,
+                "error": row["error"],
+            }
+            for row in rows
+        ]
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Cancel a job. Queued jobs stop immediately, running jobs after their current chunk."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, _now(), job_id, QUEUED),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?",
+                (job_id, RUNNING),
+            )
+        return self.get(job_id)
+
+    # Workers
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim_next()
+            except sqlite3.Error:
+                logger.exception("Could not claim a job, retrying")
+                self._stopping.wait(ERROR_BACKOFF)
+                continue
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=1.0)
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                if self._stopping.is_set():
+                    continue
+                self._handle_run_error(job["id"], e)
+
+    def _handle_run_error(self, job_id: str, error: Exception):
+        """Requeue a job after a database error, fail it after any other error.
+
+        If even that write fails, the claim is left to go stale and another
+        worker requeues the job once ``claim_timeout`` has passed.
+        """
+        try:
+            if isinstance(error, sqlite3.Error):
+                logger.warning("Database error while running job %s, requeueing", job_id, exc_info=error)
+                self._release(job_id)
+            else:
+                logger.error("Job %s failed", job_id, exc_info=error)
+                self._finish(job_id, FAILED, str(error))
+        except sqlite3.Error:
+            logger.exception("Could not update job %s after an error", job_id)
+            self._stopping.wait(ERROR_BACKOFF)
+
+    def _heartbeat_loop(self):
+        while not self._stopping.wait(self.heartbeat_interval):
+            try:
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE worker_id = ? AND status = ?",
+                        (time.time(), self.worker_id, RUNNING),
+                    )
+            except sqlite3.Error:
+                # The next beat retries; claims only go stale after claim_timeout
+                logger.exception("Could not update job heartbeats")
+
+    def _claim_next(self) -> Optional[sqlite3.Row]:
+        """Atomically move the highest-priority eligible job to running.
+
+        Claims whose holder stopped heartbeating are requeued first. Owners
+        already at their concurrency limit are skipped, so one user's backlog
+        cannot starve everyone else's jobs.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker_id = NULL, heartbeat_at = NULL "
+                    "WHERE status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                    (QUEUED, RUNNING, now - self.claim_timeout),
+                )
+                row = self._conn.execute(
+                    "SELECT id, kind, payload, completed_items FROM jobs "
+                    "WHERE status = ? AND owner NOT IN ("
+                    "  SELECT owner FROM jobs WHERE status = ? GROUP BY owner HAVING COUNT(*) >= ?"
+                    ") ORDER BY priority DESC, created_at LIMIT 1",
+                    (QUEUED, RUNNING, self.max_running_per_user),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, worker_id = ?, heartbeat_at = ?, "
+                        "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                        (RUNNING, self.worker_id, now, _now(), row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _run(self, job: sqlite3.Row):
+        payload = json.loads(job["payload"])
+        items = payload["items"]
+        # Resume after the last committed chunk if the job was interrupted
+        start = job["completed_items"]
+        for offset in range(start, len(items), self.chunk_size):
+            if self._stopping.is_set():
+                return
+            if self._cancel_requested(job["id"]):
+                self._finish(job["id"], CANCELLED)
+                return
+            chunk = items[offset:offset + self.chunk_size]
+            pool = self._pool
+            try:
+                chunk_results = pool.submit(run_chunk, job["kind"], chunk, payload["extra_payment_amounts"]).result()
+            except BrokenProcessPool:
+                # A pool process died (e.g. OOM kill); the job itself is not at fault
+                self._replace_pool(pool)
+                self._release(job["id"])
+                return
+            if not self._store_chunk(job["id"], offset, chunk_results):
+                return
+        self._finish(job["id"], COMPLETED)
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        """Swap in a fresh process pool, unless another worker thread already did"""
+        with self._pool_lock:
+            if self._pool is broken:
+                self._pool = self._new_pool()
+                broken.shutdown(wait=False, cancel_futures=True)
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row["cancel_requested"])
+
+    def _store_chunk(self, job_id: str, offset: int, chunk_results: List[Dict]) -> bool:
+        """Write a chunk's results. Returns False if this queue no longer holds the job."""
+        rows = [
+            (job_id, offset + i, json.dumps(r["result"]) if r["error"] is None else None, r["error"])
+            for i, r in enumerate(chunk_results)
+        ]
+        failed = sum(1 for r in chunk_results if r["error"] is not None)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                # Only the claim holder may advance the job, and only from where it left off
+                claimed = self._conn.execute(
+                    "UPDATE jobs SET completed_items = ?, failed_items = failed_items + ?, heartbeat_at = ? "
+                    "WHERE id = ? AND worker_id = ? AND status = ? AND completed_items = ?",
+                    (offset + len(rows), failed, time.time(), job_id, self.worker_id, RUNNING, offset),
+                ).rowcount
+                if not claimed:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO job_results (job_id, item_index, result, error) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def _finish(self, job_id: str, status: str, error: Optional[str] = None) -> bool:
+        """Move a claimed job to a final status. A cancel that arrived during the last chunk wins over completed."""
+        with self._lock:
+            return bool(self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN ? = ? AND cancel_requested = 1 THEN ? ELSE ? END, "
+                "error = ?, finished_at = ?, worker_id = NULL, heartbeat_at = NULL "
+                "WHERE id = ? AND worker_id = ? AND status = ?",
+                (status, COMPLETED, CANCELLED, status, error, _now(), job_id, self.worker_id, RUNNING),
+            ).rowcount)
+
+    def _release(self, job_id: str):
+        """Hand a claimed job back to the queue so it resumes from its last stored chunk"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = NULL, heartbeat_at = NULL "
+                "WHERE id = ? AND worker_id = ? AND status = ?",
+                (QUEUED, job_id, self.worker_id, RUNNING),
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def _job_status(row: sqlite3.Row) -> Dict:
+    status = dict(row)
+    status["cancel_requested"] = bool(status["cancel_requested"])
+    total = status["total_items"]
+    status["progress"] = status["completed_items"] / total if total else 1.0
+    return status
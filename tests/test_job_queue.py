@@ -0,0 +1,186 @@
+import sqlite3
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from services.job_queue import JobQueue
+
+ITEM = {
+    "loan_amount": 300000, "interest_rate": 4.5, "loan_term": 30, "extra_payment": 0,
+    "current_age": 35, "purchase_date": "2020-01-01T00:00:00", "home_value": 350000,
+}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+@pytest.fixture
+def queue(db_path):
+    q = JobQueue(db_path, workers=1, chunk_size=5)
+    yield q
+    q.stop()
+
+
+def wait_for(queue, job_id, statuses, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_claims_by_priority_then_age(queue):
+    low = queue.submit("a", "recalculate", [ITEM])
+    high = queue.submit("b", "recalculate", [ITEM], priority=5)
+    older = queue.submit("c", "recalculate", [ITEM])
+
+    assert [queue._claim_next()["id"] for _ in range(3)] == [high["id"], low["id"], older["id"]]
+    assert queue._claim_next() is None
+
+
+def test_owner_running_limit(queue):
+    first = queue.submit("a", "recalculate", [ITEM])
+    second = queue.submit("a", "recalculate", [ITEM])
+    other = queue.submit("b", "recalculate", [ITEM])
+
+    assert queue._claim_next()["id"] == first["id"]
+    assert queue._claim_next()["id"] == other["id"]
+    assert queue._claim_next() is None
+
+    assert queue._finish(first["id"], "completed")
+    assert queue._claim_next()["id"] == second["id"]
+
+
+def test_empty_job_is_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.submit("a", "recalculate", [])
+
+
+def test_cancel_queued_job_is_immediate(queue):
+    job = queue.submit("a", "recalculate", [ITEM])
+
+    assert queue.cancel(job["id"])["status"] == "cancelled"
+    assert queue._claim_next() is None
+
+
+def test_cancel_during_last_chunk_wins_over_completed(queue):
+    job = queue.submit("a", "recalculate", [ITEM])
+    queue._claim_next()
+    queue.cancel(job["id"])
+
+    assert queue._finish(job["id"], "completed")
+    assert queue.get(job["id"])["status"] == "cancelled"
+
+
+def test_stale_claim_is_taken_over_and_fenced(db_path, queue):
+    job = queue.submit("a", "recalculate", [ITEM] * 10)
+    queue._claim_next()
+    other = JobQueue(db_path, workers=1, chunk_size=5)
+    try:
+        # A live claim is left alone
+        assert other._claim_next() is None
+
+        with queue._lock:
+            queue._conn.execute("UPDATE jobs SET heartbeat_at = 0 WHERE id = ?", (job["id"],))
+        assert other._claim_next()["id"] == job["id"]
+
+        # The previous holder can no longer write results or finish the job
+        assert not queue._store_chunk(job["id"], 0, [{"result": {}, "error": None}] * 5)
+        assert not queue._finish(job["id"], "completed")
+        assert queue.get(job["id"])["completed_items"] == 0
+    finally:
+        other.stop()
+
+
+def test_broken_pool_requeues_job(queue):
+    job = queue.submit("a", "recalculate", [ITEM])
+    claimed = queue._claim_next()
+
+    class BrokenPool:
+        def submit(self, *args):
+            future = Future()
+            future.set_exception(BrokenProcessPool("worker died"))
+            return future
+
+        def shutdown(self, **kwargs):
+            pass
+
+    broken = BrokenPool()
+    queue._pool = broken
+    queue._run(claimed)
+
+    assert queue.get(job["id"])["status"] == "queued"
+    assert queue._pool is not broken
+
+
+def test_jobs_run_to_completion_and_page_results(queue):
+    queue.start()
+    job = queue.submit("a", "recalculate", [ITEM] * 12 + [dict(ITEM, loan_term=0)])
+    done = wait_for(queue, job["id"], {"completed"})
+
+    assert done["completed_items"] == 13
+    assert done["failed_items"] == 1
+    page = queue.results(job["id"], offset=10, limit=5)
+    assert [item["index"] for item in page] == [10, 11, 12]
+    assert page[-1]["error"] is not None
+
+
+def test_cancel_running_job(queue):
+    queue.start()
+    job = queue.submit("a", "scenario_sweep", [ITEM] * 200)
+    wait_for(queue, job["id"], {"running"})
+    queue.cancel(job["id"])
+    done = wait_for(queue, job["id"], {"cancelled", "completed"})
+
+    assert done["status"] == "cancelled"
+    assert done["completed_items"] < done["total_items"]
+
+
+def test_shared_database_never_overcounts(db_path, queue):
+    other = JobQueue(db_path, workers=1, chunk_size=5)
+    try:
+        queue.start()
+        other.start()
+        jobs = [queue.submit(owner, "recalculate", [ITEM] * 20) for owner in ("a", "b", "c")]
+        for job in jobs:
+            done = wait_for(queue, job["id"], {"completed"})
+            assert done["completed_items"] == done["total_items"]
+            assert len(queue.results(job["id"], limit=1000)) == 20
+    finally:
+        other.stop()
+
+
+def test_worker_survives_database_errors(queue, monkeypatch):
+    claim_next = queue._claim_next
+    calls = []
+
+    def flaky_claim():
+        calls.append(1)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return claim_next()
+
+    monkeypatch.setattr(queue, "_claim_next", flaky_claim)
+    queue.start()
+    job = queue.submit("a", "recalculate", [ITEM])
+
+    assert wait_for(queue, job["id"], {"completed"})["completed_items"] == 1
+
+
+def test_store_chunk_rolls_back_on_error(db_path, queue):
+    job = queue.submit("a", "recalculate", [ITEM])
+    queue._claim_next()
+    other = sqlite3.connect(db_path)
+    other.execute("DROP TABLE job_results")
+    other.close()
+
+    with pytest.raises(sqlite3.OperationalError):
+        queue._store_chunk(job["id"], 0, [{"result": {}, "error": None}])
+    assert not queue._conn.in_transaction
+    assert queue.get(job["id"])["completed_items"] == 0
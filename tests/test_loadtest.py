@@ -0,0 +1,120 @@
+import itertools
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import loadtest
+
+
+@pytest.mark.parametrize("values, pct, expected", [
+    (list(range(1, 11)), 50, 5),
+    (list(range(1, 11)), 95, 10),
+    (list(range(1, 11)), 99, 10),
+    (list(range(1, 31)), 95, 29),
+    (list(range(1, 151)), 99, 149),
+    (list(range(1, 101)), 99, 99),
+    ([7], 50, 7),
+    ([7], 99, 7),
+    ([], 99, 0.0),
+])
+def test_percentile_is_nearest_rank(values, pct, expected):
+    assert loadtest.percentile(values, pct) == expected
+
+
+def test_histogram_bucket_edges():
+    buckets = loadtest.histogram([0, 1, 1.001, 2, 5000, 5000.001])
+
+    assert buckets["<=1ms"] == 2
+    assert buckets["<=2ms"] == 2
+    assert buckets["<=5000ms"] == 1
+    assert buckets[">5000ms"] == 1
+    assert sum(buckets.values()) == 6
+
+
+def write_mix(tmp_path, lines):
+    path = tmp_path / "mix.jsonl"
+    path.write_text("".join(line + "\n" for line in lines))
+    return str(path)
+
+
+def test_load_mix_fills_defaults(tmp_path):
+    path = write_mix(tmp_path, [
+        json.dumps({"path": "/health"}),
+        "",
+        json.dumps({"path": "/calculate", "body": {}}),
+    ])
+
+    entries = loadtest.load_mix(path)
+
+    assert [(e["method"], e["route"]) for e in entries] == [
+        ("GET", "GET /health"),
+        ("POST", "POST /calculate"),
+    ]
+
+
+def test_load_mix_rejects_missing_path(tmp_path):
+    path = write_mix(tmp_path, [json.dumps({"path": "/up"}), json.dumps({"method": "GET"})])
+
+    with pytest.raises(ValueError, match=":2: request is missing 'path'"):
+        loadtest.load_mix(path)
+
+
+def test_load_mix_rejects_empty_file(tmp_path):
+    path = write_mix(tmp_path, ["", "   "])
+
+    with pytest.raises(ValueError, match="no requests found"):
+        loadtest.load_mix(path)
+
+
+def test_replay_stream_cycles_in_order():
+    entries = [{"route": "a"}, {"route": "b"}]
+    stream = loadtest.request_stream(entries, "replay", seed=0)
+
+    assert [e["route"] for e in itertools.islice(stream, 5)] == ["a", "b", "a", "b", "a"]
+
+
+def test_weighted_stream_is_deterministic_per_seed():
+    entries = [{"route": "a", "weight": 3}, {"route": "b", "weight": 1}, {"route": "never", "weight": 0}]
+
+    def sample(seed):
+        stream = loadtest.request_stream(entries, "weighted", seed)
+        return [e["route"] for e in itertools.islice(stream, 200)]
+
+    assert sample(1) == sample(1)
+    assert sample(1) != sample(2)
+    assert "never" not in sample(1)
+
+
+def test_load_report_rejects_non_reports(tmp_path):
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps({"created_at": "yesterday"}))
+
+    with pytest.raises(ValueError, match="not a load test report"):
+        loadtest.load_report(str(path))
+
+
+def test_local_server_cleans_up_when_startup_fails(monkeypatch):
+    started = []
+    popen = subprocess.Popen
+
+    def fake_popen(*args, **kwargs):
+        process = popen([sys.executable, "-c", "import time; time.sleep(60)"])
+        started.append(process)
+        return process
+
+    def never_healthy(self, timeout=30.0):
+        raise RuntimeError("uvicorn did not become healthy in time")
+
+    monkeypatch.setattr(loadtest.subprocess, "Popen", fake_popen)
+    monkeypatch.setattr(loadtest.LocalServer, "_wait_until_healthy", never_healthy)
+    server = loadtest.LocalServer(port=0, workers=1)
+
+    with pytest.raises(RuntimeError, match="did not become healthy"):
+        with server:
+            pass
+
+    assert started[0].poll() is not None
+    assert not os.path.exists(server._tmpdir.name)
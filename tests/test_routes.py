@@ -0,0 +1,113 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config import settings
+from main import app
+
+ITEM = {
+    "loan_amount": 300000, "interest_rate": 4.5, "loan_term": 30, "current_age": 35,
+    "purchase_date": "2020-01-01T00:00:00", "home_value": 350000,
+}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "job_db_path", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(settings, "job_chunk_size", 5)
+    with TestClient(app) as client:
+        yield client
+
+
+def submit(client, user="alice", **body):
+    body = {"kind": "recalculate", "items": [ITEM], **body}
+    return client.post("/api/v1/jobs", json=body, headers={"X-User-Id": user})
+
+
+def wait_for(client, job_id, statuses, user="alice", timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/v1/jobs/{job_id}", headers={"X-User-Id": user}).json()
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_submit_job_uses_user_header_as_owner(client):
+    response = submit(client, priority=3)
+
+    assert response.status_code == 202
+    job = response.json()
+    assert job["owner"] == "alice"
+    assert job["priority"] == 3
+    assert job["total_items"] == 1
+
+
+def test_submit_job_without_user_header_uses_client_host(client):
+    response = client.post("/api/v1/jobs", json={"kind": "recalculate", "items": [ITEM]})
+
+    assert response.status_code == 202
+    assert response.json()["owner"] == "testclient"
+
+
+@pytest.mark.parametrize("body", [
+    {"kind": "unknown"},
+    {"items": []},
+    {"priority": 11},
+    {"priority": -11},
+    {"items": [{"loan_amount": 1}]},
+])
+def test_submit_job_rejects_invalid_requests(client, body):
+    assert submit(client, **body).status_code == 422
+
+
+def test_submit_job_rejects_too_many_items(client):
+    response = submit(client, items=[ITEM] * (settings.job_max_items + 1))
+
+    assert response.status_code == 422
+
+
+def test_unknown_job_is_not_found(client):
+    assert client.get("/api/v1/jobs/missing").status_code == 404
+    assert client.get("/api/v1/jobs/missing/results").status_code == 404
+    assert client.delete("/api/v1/jobs/missing").status_code == 404
+
+
+def test_other_users_job_is_not_found(client):
+    job_id = submit(client).json()["id"]
+    mallory = {"X-User-Id": "mallory"}
+
+    assert client.get(f"/api/v1/jobs/{job_id}", headers=mallory).status_code == 404
+    assert client.get(f"/api/v1/jobs/{job_id}/results", headers=mallory).status_code == 404
+    assert client.delete(f"/api/v1/jobs/{job_id}", headers=mallory).status_code == 404
+    assert client.get(f"/api/v1/jobs/{job_id}", headers={"X-User-Id": "alice"}).status_code == 200
+
+
+def test_job_results_are_paged(client):
+    job_id = submit(client, items=[ITEM] * 12).json()["id"]
+    wait_for(client, job_id, {"completed"})
+
+    response = client.get(
+        f"/api/v1/jobs/{job_id}/results", params={"offset": 10, "limit": 5}, headers={"X-User-Id": "alice"}
+    )
+
+    assert response.status_code == 200
+    page = response.json()
+    assert page["status"] == "completed"
+    assert page["total_items"] == 12
+    assert [item["index"] for item in page["items"]] == [10, 11]
+    assert "amortization" not in page["items"][0]["result"]
+
+
+def test_cancel_queued_job(client):
+    # alice may only run one job at a time, so the second one stays queued
+    blocker = submit(client, kind="scenario_sweep", items=[ITEM] * 2000).json()
+    queued = submit(client).json()
+
+    response = client.delete(f"/api/v1/jobs/{queued['id']}", headers={"X-User-Id": "alice"})
+    client.delete(f"/api/v1/jobs/{blocker['id']}", headers={"X-User-Id": "alice"})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"